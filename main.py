@@ -1,4 +1,4 @@
-from src.sql_assistant.main import run_interactive_session
+from src.sql_assistant.main import main
 
 if __name__ == "__main__":
-    run_interactive_session()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -1,5 +1,9 @@
+import csv
+import io
 import psycopg2
 import random
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 from faker import Faker
 import os
 import sys
@@ -8,7 +12,11 @@ import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from src.sql_assistant.config import get_settings
 
-fake = Faker()
+NUM_CUSTOMERS = 100
+NUM_PRODUCTS = 50
+NUM_WAREHOUSES = 5
+NUM_ORDERS = 300
+FAKER_WORKERS = os.cpu_count() or 1
 
 def create_connection():
     """Create a database connection to the PostgreSQL database."""
@@ -32,13 +40,12 @@ def create_tables(conn):
     cur = conn.cursor()
     
     # Drop tables if they exist (cascade will handle dependencies)
-    cur.execute("DROP TABLE IF EXISTS order_items CASCADE;")
-    cur.execute("DROP TABLE IF EXISTS orders CASCADE;")
-    cur.execute("DROP TABLE IF EXISTS customers CASCADE;")
-    cur.execute("DROP TABLE IF EXISTS stock_movements CASCADE;")
-    cur.execute("DROP TABLE IF EXISTS inventory CASCADE;")
-    cur.execute("DROP TABLE IF EXISTS warehouses CASCADE;")
-    cur.execute("DROP TABLE IF EXISTS products CASCADE;")
+    cur.execute("""
+        DROP TABLE IF EXISTS
+            order_items, orders, customers, stock_movements,
+            inventory, warehouses, products
+        CASCADE;
+    """)
     
     cur.execute("""
         CREATE TABLE customers (
@@ -58,8 +65,7 @@ def create_tables(conn):
             order_date TEXT,
             status TEXT,
             total_amount REAL,
-            sales_region TEXT,
-            FOREIGN KEY (customer_id) REFERENCES customers (customer_id)
+            sales_region TEXT
         );
     """)
     
@@ -70,8 +76,7 @@ def create_tables(conn):
             product_id INTEGER,
             quantity INTEGER,
             unit_price REAL,
-            discount_percent REAL,
-            FOREIGN KEY (order_id) REFERENCES orders (order_id)
+            discount_percent REAL
         );
     """)
 
@@ -103,9 +108,7 @@ def create_tables(conn):
             product_id INTEGER,
             warehouse_id INTEGER,
             quantity_on_hand INTEGER,
-            last_updated TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (product_id) REFERENCES products (product_id),
-            FOREIGN KEY (warehouse_id) REFERENCES warehouses (warehouse_id)
+            last_updated TEXT DEFAULT CURRENT_TIMESTAMP
         );
     """)
     
@@ -118,115 +121,207 @@ def create_tables(conn):
             movement_type TEXT,
             quantity INTEGER,
             movement_date TEXT,
-            reference_number TEXT,
-            FOREIGN KEY (product_id) REFERENCES products (product_id),
-            FOREIGN KEY (warehouse_id) REFERENCES warehouses (warehouse_id)
+            reference_number TEXT
         );
     """)
     
     cur.close()
 
+FOREIGN_KEYS = [
+    ("orders", "customer_id", "customers"),
+    ("order_items", "order_id", "orders"),
+    ("inventory", "product_id", "products"),
+    ("inventory", "warehouse_id", "warehouses"),
+    ("stock_movements", "product_id", "products"),
+    ("stock_movements", "warehouse_id", "warehouses"),
+]
+
+def add_foreign_keys(conn):
+    """Add the foreign keys once the data is loaded (one validation scan per FK)."""
+    print("Adding foreign keys...")
+    cur = conn.cursor()
+    for table, column, ref_table in FOREIGN_KEYS:
+        cur.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey "
+            f"FOREIGN KEY ({column}) REFERENCES {ref_table} ({column});"
+        )
+    cur.close()
+
+def reserve_ids(cur, reservations):
+    """Reserve ids from several SERIAL sequences in a single round-trip.
+
+    ``reservations`` is a list of ``(table, column, n)``; returns one id list per entry.
+    """
+    arrays = ", ".join(
+        "ARRAY(SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s))"
+        for _ in reservations
+    )
+    cur.execute(f"SELECT {arrays}", [value for reservation in reservations for value in reservation])
+    return list(cur.fetchone())
+
+def copy_rows(cur, table, columns, rows):
+    """Stream ``rows`` into ``table`` with a single COPY ... FROM STDIN."""
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH CSV", buf)
+
+def random_amounts(low, high, k):
+    """Draw ``k`` uniformly distributed amounts in [low, high] with two decimals."""
+    return [cents / 100 for cents in random.choices(range(low * 100, high * 100 + 1), k=k)]
+
+# --- Faker row factories ---
+# Top-level (picklable) functions run in worker processes; each builds its
+# own seeded Faker so workers don't share generator state.
+
+def _worker_faker(seed):
+    fake = Faker()
+    fake.seed_instance(seed)
+    return fake
+
+def fake_customer_fields(seed, n):
+    """(name, email, signup_date) tuples."""
+    fake = _worker_faker(seed)
+    return [
+        (fake.name(), fake.email(), fake.date_between(start_date='-2y', end_date='today').isoformat())
+        for _ in range(n)
+    ]
+
+def fake_product_fields(seed, n):
+    """(product_name, sku) tuples."""
+    fake = _worker_faker(seed)
+    return [(fake.word().title() + " " + fake.word().title(), fake.ean()) for _ in range(n)]
+
+def fake_warehouse_fields(seed, n):
+    """(warehouse_name, location) tuples."""
+    fake = _worker_faker(seed)
+    return [(f"Warehouse {fake.city()}", fake.address()) for _ in range(n)]
+
+def fake_order_fields(seed, n):
+    """(order_date,) tuples."""
+    fake = _worker_faker(seed)
+    return [(fake.date_between(start_date='-1y', end_date='today').isoformat(),) for _ in range(n)]
+
+def fake_columns(executor, factory, n):
+    """Fan ``factory`` out over the pool and return its fields as columns."""
+    chunks = min(n, FAKER_WORKERS)
+    sizes = [n // chunks + (1 if i < n % chunks else 0) for i in range(chunks)]
+    seeds = [random.randrange(2**32) for _ in sizes]
+    rows = chain.from_iterable(executor.map(factory, seeds, sizes))
+    return [list(column) for column in zip(*rows)]
+
 def generate_data(conn):
     print("Generating data...")
     cur = conn.cursor()
+
+    # The whole seed runs in the single transaction committed by main(), so
+    # skip the WAL flush wait on that commit. (There is nothing to defer: the
+    # foreign keys are only added, and validated, after the load.)
+    cur.execute("SET LOCAL synchronous_commit = OFF")
+
+    # Free-text fields come from Faker running across a process pool;
+    # the remaining columns are drawn a whole column at a time below.
+    print("  - Faker fields")
+    with ProcessPoolExecutor(max_workers=FAKER_WORKERS) as executor:
+        customer_fields = fake_columns(executor, fake_customer_fields, NUM_CUSTOMERS)
+        product_fields = fake_columns(executor, fake_product_fields, NUM_PRODUCTS)
+        warehouse_fields = fake_columns(executor, fake_warehouse_fields, NUM_WAREHOUSES)
+        (order_dates,) = fake_columns(executor, fake_order_fields, NUM_ORDERS)
+
+    customer_ids, product_ids, warehouse_ids, order_ids = reserve_ids(cur, [
+        ("customers", "customer_id", NUM_CUSTOMERS),
+        ("products", "product_id", NUM_PRODUCTS),
+        ("warehouses", "warehouse_id", NUM_WAREHOUSES),
+        ("orders", "order_id", NUM_ORDERS),
+    ])
     
     # --- Customers ---
     print("  - Customers")
-    customer_ids = []
+    n = len(customer_ids)
     tiers = ['bronze', 'silver', 'gold', 'platinum']
     statuses = ['active', 'inactive']
-    for _ in range(100):
-        name = fake.name()
-        email = fake.email()
-        signup_date = fake.date_between(start_date='-2y', end_date='today').isoformat()
-        status = random.choice(statuses)
-        tier = random.choice(tiers)
-        
-        cur.execute(
-            "INSERT INTO customers (name, email, signup_date, status, customer_tier) VALUES (%s, %s, %s, %s, %s) RETURNING customer_id",
-            (name, email, signup_date, status, tier)
-        )
-        customer_ids.append(cur.fetchone()[0])
+    customers = zip(
+        customer_ids,
+        *customer_fields,
+        random.choices(statuses, k=n),
+        random.choices(tiers, k=n),
+    )
+
+    copy_rows(cur, "customers", ["customer_id", "name", "email", "signup_date", "status", "customer_tier"], customers)
 
     # --- Products ---
     print("  - Products")
-    product_ids = []
+    n = len(product_ids)
     categories = ['Electronics', 'Clothing', 'Home', 'Toys']
-    for _ in range(50):
-        pname = fake.word().title() + " " + fake.word().title()
-        sku = fake.ean()
-        category = random.choice(categories)
-        cost = round(random.uniform(5, 500), 2)
-        reorder = random.randint(10, 100)
-        disc = 1 if random.choice([True, False]) else 0
-        
-        cur.execute(
-            "INSERT INTO products (product_name, sku, category, unit_cost, reorder_point, discontinued) VALUES (%s, %s, %s, %s, %s, %s) RETURNING product_id",
-            (pname, sku, category, cost, reorder, disc)
-        )
-        product_ids.append(cur.fetchone()[0])
+    products = zip(
+        product_ids,
+        *product_fields,
+        random.choices(categories, k=n),
+        random_amounts(5, 500, n),
+        random.choices(range(10, 101), k=n),
+        random.choices((0, 1), k=n),
+    )
+
+    copy_rows(cur, "products", ["product_id", "product_name", "sku", "category", "unit_cost", "reorder_point", "discontinued"], products)
 
     # --- Warehouses ---
     print("  - Warehouses")
-    warehouse_ids = []
-    for _ in range(5):
-        wname = f"Warehouse {fake.city()}"
-        loc = fake.address()
-        cap = random.randint(1000, 10000)
-        
-        cur.execute(
-            "INSERT INTO warehouses (warehouse_name, location, capacity) VALUES (%s, %s, %s) RETURNING warehouse_id",
-            (wname, loc, cap)
-        )
-        warehouse_ids.append(cur.fetchone()[0])
+    n = len(warehouse_ids)
+    warehouses = zip(
+        warehouse_ids,
+        *warehouse_fields,
+        random.choices(range(1000, 10001), k=n),
+    )
+
+    copy_rows(cur, "warehouses", ["warehouse_id", "warehouse_name", "location", "capacity"], warehouses)
         
     # --- Inventory ---
     print("  - Inventory")
-    for pid in product_ids:
-        for wid in warehouse_ids:
-            if random.random() > 0.3: # 70% chance product is in warehouse
-                qty = random.randint(0, 500)
-                cur.execute(
-                    "INSERT INTO inventory (product_id, warehouse_id, quantity_on_hand) VALUES (%s, %s, %s)",
-                    (pid, wid, qty)
-                )
+    # 70% chance product is in warehouse
+    stocked = [(pid, wid) for pid in product_ids for wid in warehouse_ids if random.random() > 0.3]
+    inventory = [
+        (pid, wid, qty)
+        for (pid, wid), qty in zip(stocked, random.choices(range(0, 501), k=len(stocked)))
+    ]
+
+    copy_rows(cur, "inventory", ["product_id", "warehouse_id", "quantity_on_hand"], inventory)
 
     # --- Orders & Order Items ---
     print("  - Orders & Items")
     order_statuses = ['pending', 'completed', 'cancelled', 'refunded']
     regions = ['north', 'south', 'east', 'west']
-    
-    for _ in range(300):
-        cid = random.choice(customer_ids)
-        order_date = fake.date_between(start_date='-1y', end_date='today').isoformat()
-        status = random.choice(order_statuses)
-        region = random.choice(regions)
-        
-        cur.execute(
-            "INSERT INTO orders (customer_id, order_date, status, total_amount, sales_region) VALUES (%s, %s, %s, %s, %s) RETURNING order_id",
-            (cid, order_date, status, 0, region)
-        )
-        order_id = cur.fetchone()[0]
-        
-        # Items
-        num_items = random.randint(1, 5)
-        batch_total = 0
-        for _ in range(num_items):
-            pid = random.choice(product_ids)
-            qty = random.randint(1, 10)
-            u_price = round(random.uniform(10, 200), 2)
-            disc = round(random.uniform(0, 10), 2)
-            
-            line_total = qty * u_price * (1 - disc/100)
-            batch_total += line_total
-            
-            cur.execute(
-                "INSERT INTO order_items (order_id, product_id, quantity, unit_price, discount_percent) VALUES (%s, %s, %s, %s, %s)",
-                (order_id, pid, qty, u_price, disc)
-            )
-        
-        # Update total
-        cur.execute("UPDATE orders SET total_amount = %s WHERE order_id = %s", (round(batch_total, 2), order_id))
+    n = len(order_ids)
+
+    # order_items columns, kept as parallel lists for the unnest() insert
+    num_items = random.choices(range(1, 6), k=n)
+    item_order_ids = [oid for oid, count in zip(order_ids, num_items) for _ in range(count)]
+    n_items = len(item_order_ids)
+    item_product_ids = random.choices(product_ids, k=n_items)
+    item_qtys = random.choices(range(1, 11), k=n_items)
+    item_prices = random_amounts(10, 200, n_items)
+    item_discs = random_amounts(0, 10, n_items)
+
+    # Order totals are known before the order rows are written
+    totals = dict.fromkeys(order_ids, 0)
+    for oid, qty, u_price, disc in zip(item_order_ids, item_qtys, item_prices, item_discs):
+        totals[oid] += qty * u_price * (1 - disc/100)
+
+    orders = zip(
+        order_ids,
+        random.choices(customer_ids, k=n),
+        order_dates,
+        random.choices(order_statuses, k=n),
+        [round(totals[oid], 2) for oid in order_ids],
+        random.choices(regions, k=n),
+    )
+
+    copy_rows(cur, "orders", ["order_id", "customer_id", "order_date", "status", "total_amount", "sales_region"], orders)
+    # One statement planned once, rather than a per-tuple VALUES list
+    cur.execute(
+        "INSERT INTO order_items (order_id, product_id, quantity, unit_price, discount_percent) "
+        "SELECT * FROM unnest(%s::int[], %s::int[], %s::int[], %s::real[], %s::real[])",
+        (item_order_ids, item_product_ids, item_qtys, item_prices, item_discs)
+    )
 
     cur.close()
 
@@ -235,6 +330,7 @@ def main():
     if conn is not None:
         create_tables(conn)
         generate_data(conn)
+        add_foreign_keys(conn)
         conn.commit()
         conn.close()
         print(f"Success! PostgreSQL database populated.")
@@ -1,14 +1,15 @@
 import operator
+import re
 from typing import Annotated, Sequence, TypedDict, Union, List
 import logging
 
 from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableLambda
 from langchain_core.tools import tool
 from langgraph.graph import StateGraph, END, START
 from langgraph.prebuilt import ToolNode
 from langchain_openai import ChatOpenAI
-import psycopg2 
 
 from .config import get_settings
 from .skills.repository import get_skill_repository
@@ -26,6 +27,23 @@ class AgentState(TypedDict):
 
 # --- Tools ---
 
+# A trailing statement terminator, plus any whitespace/comments after it
+# (block comments are matched without crossing a "*/", so a second statement
+# after a comment is never mistaken for part of the trailing comments)
+_STATEMENT_END_RE = re.compile(r";(?:\s|--[^\n]*|/\*(?:[^*]|\*(?!/))*\*/)*\Z")
+
+def strip_statement_end(query: str) -> str:
+    """Drop a trailing ``;`` (and comments after it) so the query can be nested."""
+    return _STATEMENT_END_RE.sub("", query.strip())
+
+def _preview_query(base_query: str, limit: int) -> str:
+    """Wrap a read query so that it returns at most ``limit`` rows.
+
+    The inner query sits on its own lines, so a trailing ``-- comment`` in it
+    cannot swallow the closing part of the wrapper.
+    """
+    return f"SELECT * FROM (\n{base_query}\n) AS _preview LIMIT {limit}"
+
 # --- Tools ---
 @tool
 def load_skill(skill_name: str) -> str:
@@ -54,12 +72,28 @@ def execute_postgres_query(query: str) -> str:
     logger.debug(f"Query: {query}")
     # settings = get_settings() # Handled by database.py
     
-    from .database import get_db_connection # Lazy import to avoid circular deps if any
+    from .database import get_db_connection, is_read_query, execute_prepared # Lazy import to avoid circular deps if any
+    
+    preview_rows = 10 # Limit context usage
+    estimated_rows = None
+    read_query = is_read_query(query)
     
     try:
-        with get_db_connection() as conn:
+        # Reads run in a read-only autocommit session: no BEGIN/COMMIT round-trips
+        with get_db_connection(readonly=read_query, autocommit=read_query) as conn:
             cursor = conn.cursor()
-            cursor.execute(query)
+            
+            if read_query:
+                # Only fetch the preview (+1 to know there is more); the planner's
+                # estimate stands in for the full row count. A repeated preview runs
+                # as a prepared statement so it skips parse/plan.
+                base_query = strip_statement_end(query)
+                cursor.execute(f"EXPLAIN (FORMAT JSON)\n{base_query}")
+                estimated_rows = cursor.fetchone()[0][0]["Plan"]["Plan Rows"]
+                preview_query = _preview_query(base_query, preview_rows + 1)
+                execute_prepared(cursor, preview_query)
+            else:
+                cursor.execute(query)
             
             if cursor.description:
                 columns = [col.name for col in cursor.description]
@@ -68,7 +102,8 @@ def execute_postgres_query(query: str) -> str:
                 columns = []
                 results = []
             
-            conn.commit()
+            if not read_query:
+                conn.commit()
             # conn closes automatically by context manager (returned to pool)
         
         if not results:
@@ -76,17 +111,21 @@ def execute_postgres_query(query: str) -> str:
             return "Query executed successfully per row count: 0"
             
         # Format as simple markdown table for LLM readability
-        header = "| " + " | ".join(columns) + " |"
-        separator = "| " + " | ".join(["---"] * len(columns)) + " |"
-        rows = []
-        for row in results[:10]: # Limit context usage
-            rows.append("| " + " | ".join(str(cell) for cell in row) + " |")
+        sep = " | "
+        lines = [
+            "| {} |".format(sep.join(columns)),
+            "| {} |".format(sep.join(["---"] * len(columns))),
+            "\n".join("| {} |".format(sep.join(map(str, row))) for row in results[:preview_rows]),
+        ]
             
-        if len(results) > 10:
-            rows.append(f"... ({len(results) - 10} more rows)")
+        if len(results) > preview_rows:
+            if estimated_rows is not None:
+                lines.append(f"... (~{max(estimated_rows - preview_rows, 1)} more rows, estimated)")
+            else:
+                lines.append(f"... ({len(results) - preview_rows} more rows)")
             
         logger.info(f"Query executed successfully. Rows: {len(results)}")
-        return "\n".join([header, separator] + rows)
+        return "\n".join(lines)
 
     except Exception as e:
         logger.error(f"Database Error: {e}")
@@ -94,8 +133,12 @@ def execute_postgres_query(query: str) -> str:
 
 # --- Agent Logic ---
 
-def create_agent_graph(checkpointer=None):
-    """Builds the LangGraph state graph for the agent."""
+def create_agent_graph(checkpointer=None, http_client=None, http_async_client=None):
+    """Builds the LangGraph state graph for the agent.
+    
+    ``http_client`` / ``http_async_client`` are optional shared httpx clients
+    for the OpenAI API, so connections are kept alive across agent turns.
+    """
     settings = get_settings()
     # repo = get_skill_repository() # This line is not used in the provided snippet, but was in the original.
     from .skills.repository import get_skill_repository # Lazy import
@@ -105,7 +148,9 @@ def create_agent_graph(checkpointer=None):
     llm = ChatOpenAI(
         model=settings.OPENAI_MODEL_NAME, 
         api_key=settings.OPENAI_API_KEY,
-        temperature=0
+        temperature=0,
+        http_client=http_client,
+        http_async_client=http_async_client
     )
     
     # Bind tools
@@ -129,13 +174,22 @@ def create_agent_graph(checkpointer=None):
         "about handling a specific type of request. "
         "Do not guess the schema; always load the relevant skill first."
     )
+    # Built once per graph, not on every LLM turn
+    system_message = SystemMessage(content=system_prompt)
 
     # Node: Agent (LLM Call)
     def agent_node(state: AgentState):
         messages = state["messages"]
         
         # Construct the call explicitly
-        response = llm_with_tools.invoke([SystemMessage(content=system_prompt)] + messages)
+        response = llm_with_tools.invoke([system_message, *messages])
+        return {"messages": [response]}
+
+    # Async variant used by graph.astream (API), so the LLM round-trip
+    # doesn't block the event loop
+    async def aagent_node(state: AgentState):
+        messages = state["messages"]
+        response = await llm_with_tools.ainvoke([system_message, *messages])
         return {"messages": [response]}
 
 # Node: Human Approval (Pass-through)
@@ -145,7 +199,7 @@ def create_agent_graph(checkpointer=None):
     # Build Graph
     graph_builder = StateGraph(AgentState)
     
-    graph_builder.add_node("agent", agent_node)
+    graph_builder.add_node("agent", RunnableLambda(agent_node, afunc=aagent_node))
     tool_node = ToolNode(tools=tools)
     graph_builder.add_node("tools", tool_node)
     graph_builder.add_node("human_approval", human_approval_node)
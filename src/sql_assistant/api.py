@@ -1,3 +1,6 @@
+import asyncio
+import io
+import itertools
 import logging
 import os
 import uuid
@@ -5,6 +8,7 @@ import re
 from typing import Optional, List, Dict, Any
 from contextlib import asynccontextmanager
 
+import httpx
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
@@ -12,9 +16,9 @@ from pydantic import BaseModel
 from langchain_core.messages import HumanMessage
 from langgraph.checkpoint.memory import MemorySaver
 
-from .agent import create_agent_graph
+from .agent import create_agent_graph, strip_statement_end
 from .config import get_settings
-from .database import get_db_connection, DatabasePool
+from .database import get_db_connection, is_read_query, DatabasePool
 
 # Configure Logging
 logging.basicConfig(
@@ -23,6 +27,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Extracts the SQL from a ```sql ... ``` block in the agent's response
+_SQL_BLOCK_RE = re.compile(r"```(?:sql)?(.*?)```", re.DOTALL)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifecycle: DB Pool, Checkpointer, Env Vars."""
@@ -39,10 +46,19 @@ async def lifespan(app: FastAPI):
     # 2. Initialize Database Pool (for tools)
     DatabasePool.initialize()
     
-    # 3. Initialize Persistence (In-Memory)
+    # 3. Shared OpenAI HTTP clients (HTTP/2 + keep-alive across requests)
+    limits = httpx.Limits(max_keepalive_connections=50, max_connections=100, keepalive_expiry=60)
+    http_client = httpx.Client(http2=True, limits=limits)
+    http_async_client = httpx.AsyncClient(http2=True, limits=limits)
+    
+    # 4. Initialize Persistence (In-Memory)
     try:
         checkpointer = MemorySaver()
-        app.state.graph = create_agent_graph(checkpointer=checkpointer)
+        app.state.graph = create_agent_graph(
+            checkpointer=checkpointer,
+            http_client=http_client,
+            http_async_client=http_async_client
+        )
         logger.info("Graph initialized with In-Memory Persistence.")
         yield
     except Exception as e:
@@ -50,6 +66,8 @@ async def lifespan(app: FastAPI):
         raise
     finally:
         # Cleanup
+        http_client.close()
+        await http_async_client.aclose()
         DatabasePool.close_all()
         logger.info("Shutdown complete.")
 
@@ -89,34 +107,63 @@ def execute_query_locally(query: str):
     """Executes a SQL query against the configured database using the pool."""
     try:
         logger.info(f"Executing SQL Query (Local): {query}")
+        settings = get_settings()
+        max_rows = settings.QUERY_MAX_ROWS
+        truncated = False
+        read_query = is_read_query(query)
         
-        # Use the context manager from database.py which handles getting/returning connection
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query)
+        # Use the context manager from database.py which handles getting/returning connection.
+        # Reads run in a read-only transaction (the server-side cursor needs one),
+        # which is rolled back on return instead of committed.
+        with get_db_connection(readonly=read_query) as conn:
+            # Bound server-side compute; SET LOCAL resets at the end of this transaction
+            conn.cursor().execute("SET LOCAL statement_timeout = %s", (settings.QUERY_STATEMENT_TIMEOUT,))
             
-            if cursor.description:
+            if read_query:
+                # Named (server-side) cursor: rows are fetched in chunks and
+                # capped, so memory stays flat regardless of the result size
+                cursor = conn.cursor(name="stream_cur")
+                cursor.itersize = 1000
+                cursor.execute(strip_statement_end(query))
+                results = list(itertools.islice(cursor, max_rows + 1))
                 columns = [col.name for col in cursor.description]
-                results = cursor.fetchall()
+                cursor.close()
+                
+                if len(results) > max_rows:
+                    truncated = True
+                    results = results[:max_rows]
             else:
-                columns = []
-                results = []
-            
-            conn.commit()
+                cursor = conn.cursor()
+                cursor.execute(query)
+                
+                if cursor.description:
+                    columns = [col.name for col in cursor.description]
+                    results = cursor.fetchmany(max_rows + 1)
+                    if len(results) > max_rows:
+                        truncated = True
+                        results = results[:max_rows]
+                else:
+                    columns = []
+                    results = []
+                
+                conn.commit()
         
         # Format Output
         if not results:
             result_text = "[Execution Result]: No results found."
             structured_data = None
         else:
-            # Simple Markdown Table
-            header = "| " + " | ".join(columns) + " |"
-            separator = "| " + " | ".join(["---"] * len(columns)) + " |"
-            rows_md = []
-            for row in results:
-                rows_md.append("| " + " | ".join(str(cell) for cell in row) + " |")
+            # Simple Markdown Table (all rows, so write into one buffer)
+            sep = " | "
+            buf = io.StringIO()
+            buf.write("| {} |\n".format(sep.join(columns)))
+            buf.write("| {} |".format(sep.join(["---"] * len(columns))))
+            buf.writelines("\n| {} |".format(sep.join(map(str, row))) for row in results)
             
-            result_text = "\n".join([header, separator] + rows_md)
+            if truncated:
+                buf.write(f"\n... (truncated to the first {max_rows} rows)")
+            
+            result_text = buf.getvalue()
             
             # Structured Data
             structured_data = {
@@ -131,15 +178,16 @@ def execute_query_locally(query: str):
         logger.error(f"Database Execution Error: {e}")
         return f"Error executing query: {str(e)}", None, str(e)
 
-def process_run(graph, thread_id, inputs, config):
+async def process_run(graph, thread_id, inputs, config):
     """Helper to run the graph and format response."""
     # Note: graph is now passed in
     try:
-        # Stream strictly values to handle updates
-        events = list(graph.stream(inputs, config, stream_mode="values"))
+        # Drive the graph to its next stop; only the final state is read below
+        async for _ in graph.astream(inputs, config, stream_mode="updates"):
+            pass
         
         # Check final state
-        snapshot = graph.get_state(config)
+        snapshot = await graph.aget_state(config)
         
         # Determine Status
         if snapshot.next and "human_approval" in snapshot.next:
@@ -177,20 +225,20 @@ async def chat(request: ChatRequest, api_request: Request):
     graph = api_request.app.state.graph
     
     # Check interrupt state
-    snapshot = graph.get_state(config)
+    snapshot = await graph.aget_state(config)
     if snapshot.next and "human_approval" in snapshot.next:
-         graph.update_state(config, {"messages": [HumanMessage(content=f"Rejected. Feedback: {request.message}")]})
+         await graph.aupdate_state(config, {"messages": [HumanMessage(content=f"Rejected. Feedback: {request.message}")]})
 
     inputs = {"messages": [HumanMessage(content=request.message)]} if not (snapshot.next and "human_approval" in snapshot.next) else None
     
-    chat_response = process_run(graph, thread_id, inputs, config)
+    chat_response = await process_run(graph, thread_id, inputs, config)
 
     # AUTO EXECUTE LOGIC
     if request.auto_execute and chat_response.status == "approval_required":
         try:
             # Extract SQL
             content = chat_response.response
-            match = re.search(r"```(?:sql)?(.*?)```", content, re.DOTALL)
+            match = _SQL_BLOCK_RE.search(content) if "```" in content else None
             if match:
                 query = match.group(1).strip()
             else:
@@ -198,8 +246,8 @@ async def chat(request: ChatRequest, api_request: Request):
             
             logger.info(f"Auto-executing query for thread {thread_id}: {query}")
             
-            # Execute
-            result_text, structured_data, error = execute_query_locally(query)
+            # Execute (blocking psycopg2 call, so off the event loop)
+            result_text, structured_data, error = await asyncio.to_thread(execute_query_locally, query)
             
             if error:
                  logger.warning(f"Auto-execution failed for thread {thread_id}: {error}")
@@ -210,10 +258,12 @@ async def chat(request: ChatRequest, api_request: Request):
                     query=query
                 )
 
-            # Resume Graph with Result
-            graph.update_state(config, {"messages": [HumanMessage(content="<SYSTEM: Execution Completed Locally>")]})
-            # Resume strictly
-            list(graph.stream(None, config, stream_mode="values"))
+            # Resume Graph with Result (recorded as the approval step, routes to END)
+            await graph.aupdate_state(
+                config,
+                {"messages": [HumanMessage(content="<SYSTEM: Execution Completed Locally>")]},
+                as_node="human_approval",
+            )
             
             return ChatResponse(
                 thread_id=thread_id,
@@ -238,7 +288,7 @@ async def approval(request: ApprovalRequest, api_request: Request):
     
     graph = api_request.app.state.graph
     config = {"configurable": {"thread_id": request.thread_id}}
-    snapshot = graph.get_state(config)
+    snapshot = await graph.aget_state(config)
     
     if not (snapshot.next and "human_approval" in snapshot.next):
         raise HTTPException(status_code=400, detail="Conversation is not waiting for approval.")
@@ -249,15 +299,15 @@ async def approval(request: ApprovalRequest, api_request: Request):
         content = last_msg.content
         
         # 2. Extract SQL
-        match = re.search(r"```(?:sql)?(.*?)```", content, re.DOTALL)
+        match = _SQL_BLOCK_RE.search(content) if "```" in content else None
         if match:
             query = match.group(1).strip()
         else:
             # Use whole content if no code block found (flexible fallback)
             query = content.strip()
             
-        # 3. Execute using Helper
-        result_text, structured_data, error = execute_query_locally(query)
+        # 3. Execute using Helper (blocking psycopg2 call, so off the event loop)
+        result_text, structured_data, error = await asyncio.to_thread(execute_query_locally, query)
         
         if error:
              return ChatResponse(
@@ -268,8 +318,11 @@ async def approval(request: ApprovalRequest, api_request: Request):
             )
             
         # 5. "Finish" the turn without Agent LLM
-        graph.update_state(config, {"messages": [HumanMessage(content="<SYSTEM: Execution Completed Locally>")]})
-        list(graph.stream(None, config, stream_mode="values"))
+        await graph.aupdate_state(
+            config,
+            {"messages": [HumanMessage(content="<SYSTEM: Execution Completed Locally>")]},
+            as_node="human_approval",
+        )
         
         return ChatResponse(
             thread_id=request.thread_id,
@@ -282,8 +335,8 @@ async def approval(request: ApprovalRequest, api_request: Request):
     else:
         # Rejection
         feedback = request.feedback or "Rejected."
-        graph.update_state(config, {"messages": [HumanMessage(content=f"Rejected. Feedback: {feedback}")]})
-        return process_run(graph, request.thread_id, None, config)
+        await graph.aupdate_state(config, {"messages": [HumanMessage(content=f"Rejected. Feedback: {feedback}")]})
+        return await process_run(graph, request.thread_id, None, config)
 
 if __name__ == "__main__":
     import uvicorn
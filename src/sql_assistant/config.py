@@ -21,8 +21,15 @@ class Settings(BaseSettings):
     POSTGRES_DB: str
     POSTGRES_HOST: str
     POSTGRES_PORT: str
+    # Connection pool bounds (minconn connections are opened at startup)
+    POSTGRES_MIN_CONN: int = 4
+    POSTGRES_MAX_CONN: int = 20
 
-@lru_cache
+    # Query execution limits
+    QUERY_MAX_ROWS: int = 1000
+    QUERY_STATEMENT_TIMEOUT: str = "30s"
+
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
     """Return a cached instance of the settings."""
     return Settings()
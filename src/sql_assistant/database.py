@@ -1,5 +1,11 @@
+import hashlib
 import logging
+import re
+import threading
+import weakref
+from collections import OrderedDict
 import psycopg2
+import psycopg2.errors
 from psycopg2 import pool
 from contextlib import contextmanager
 
@@ -7,9 +13,72 @@ from .config import get_settings
 
 logger = logging.getLogger(__name__)
 
+_READ_QUERY_RE = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+# Writes that can still start with SELECT/WITH: data-modifying CTEs, SELECT ... INTO,
+# row locks (FOR UPDATE/SHARE) and sequence updates. The match is purely lexical,
+# so a hit inside a string literal just sends a read down the read-write path.
+_WRITE_KEYWORD_RE = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|INTO|SHARE|setval|nextval)\b", re.IGNORECASE)
+
+def is_read_query(query: str) -> bool:
+    """Return True if the query is a plain SELECT (optionally with CTEs) that writes nothing."""
+    return _READ_QUERY_RE.match(query) is not None and _WRITE_KEYWORD_RE.search(query) is None
+
+# Query hashes seen per pooled connection, in LRU order, mapped to whether a
+# server-side prepared statement exists for them yet. Weakly keyed, so
+# connections the pool discards or closes drop their entry.
+_PREPARED_PER_CONNECTION = 64
+_prepared_statements: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+def execute_prepared(cursor, query: str) -> None:
+    """Execute ``query``, as a server-side prepared statement once it repeats.
+
+    The first time a query text is seen on a connection it runs as-is (one
+    round trip); only the second sighting pays for a PREPARE, after which
+    ``EXECUTE <name>`` skips PostgreSQL's parse/plan step. Meant for
+    autocommit connections: a failed EXECUTE must not abort a transaction.
+
+    If the prepared statement went stale (e.g. DDL changed its result type)
+    or disappeared, it is forgotten and the query runs as-is instead.
+    """
+    names = _prepared_statements.setdefault(cursor.connection, OrderedDict())
+    name = "q_" + hashlib.blake2b(query.encode(), digest_size=8).hexdigest()
+    
+    prepared = names.get(name)
+    if prepared is None:
+        # First sighting: remember it, but don't prepare a one-off query
+        while len(names) >= _PREPARED_PER_CONNECTION:
+            evicted, evicted_prepared = names.popitem(last=False)
+            if evicted_prepared:
+                cursor.execute(f"DEALLOCATE {evicted}")
+        names[name] = False
+        cursor.execute(query)
+        return
+    
+    names.move_to_end(name)
+    if not prepared:
+        # Prepared statements outlive transaction rollbacks, so only a
+        # successful PREPARE is recorded
+        cursor.execute(f"PREPARE {name} AS {query}")
+        names[name] = True
+    
+    try:
+        cursor.execute(f"EXECUTE {name}")
+    except (psycopg2.errors.FeatureNotSupported, psycopg2.errors.InvalidSqlStatementName) as e:
+        # "cached plan must not change result type" / "prepared statement does not exist"
+        logger.info(f"Prepared statement {name} is stale ({e.pgcode}); running the query directly")
+        del names[name]
+        if isinstance(e, psycopg2.errors.FeatureNotSupported):
+            cursor.execute(f"DEALLOCATE {name}")
+        cursor.execute(query)
+
 class DatabasePool:
     _instance = None
     _pool = None
+    # One slot per pooled connection: ThreadedConnectionPool raises PoolError
+    # instead of waiting when all connections are checked out, and DB work runs
+    # concurrently on executor threads, so checkouts queue here instead
+    _slots = None
 
     @classmethod
     def initialize(cls):
@@ -17,16 +86,22 @@ class DatabasePool:
             try:
                 settings = get_settings()
                 logger.info("Initializing Database Connection Pool...")
+                # ThreadedConnectionPool opens minconn connections eagerly, so the
+                # first requests don't pay connection setup on the hot path.
+                cls._slots = threading.BoundedSemaphore(settings.POSTGRES_MAX_CONN)
                 cls._pool = psycopg2.pool.ThreadedConnectionPool(
-                    minconn=1,
-                    maxconn=20,
+                    minconn=settings.POSTGRES_MIN_CONN,
+                    maxconn=settings.POSTGRES_MAX_CONN,
                     host=settings.POSTGRES_HOST,
                     database=settings.POSTGRES_DB,
                     user=settings.POSTGRES_USER,
                     password=settings.POSTGRES_PASSWORD,
                     port=settings.POSTGRES_PORT
                 )
-                logger.info("Database Connection Pool Initialized.")
+                logger.info(
+                    f"Database Connection Pool Initialized "
+                    f"(min={settings.POSTGRES_MIN_CONN}, max={settings.POSTGRES_MAX_CONN})."
+                )
             except Exception as e:
                 logger.critical(f"Failed to initialize database pool: {e}")
                 raise
@@ -41,14 +116,32 @@ class DatabasePool:
     def close_all(cls):
         if cls._pool:
             cls._pool.closeall()
+            _prepared_statements.clear()
             logger.info("Database Connection Pool Closed.")
 
 @contextmanager
-def get_db_connection():
-    """Context manager for getting a database connection from the pool."""
+def get_db_connection(readonly: bool = False, autocommit: bool = False):
+    """Context manager for getting a database connection from the pool.
+    
+    ``readonly`` / ``autocommit`` apply to this checkout only; the session is
+    reset (and any open transaction rolled back) before the connection goes
+    back to the pool. When every connection is in use, this waits for one to be
+    returned rather than failing.
+    """
     pool = DatabasePool.get_pool()
-    conn = pool.getconn()
+    slots = DatabasePool._slots
+    slots.acquire()
     try:
-        yield conn
+        conn = pool.getconn()
+        custom_session = readonly or autocommit
+        try:
+            if custom_session:
+                conn.set_session(readonly=readonly or "DEFAULT", autocommit=autocommit)
+            yield conn
+        finally:
+            if custom_session and not conn.closed:
+                conn.rollback()
+                conn.set_session(readonly="DEFAULT", autocommit=False)
+            pool.putconn(conn)
     finally:
-        pool.putconn(conn)
+        slots.release()
@@ -1,36 +1,158 @@
+import asyncio
+import io
+import itertools
+import re
 import sys
+import threading
 import uuid
 from typing import Dict, Any
 
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 from langgraph.checkpoint.memory import InMemorySaver
 
-from .agent import create_agent_graph
+from .agent import create_agent_graph, strip_statement_end
 from .config import get_settings
 
+# Extracts the SQL from a ```sql ... ``` block in the agent's response
+_SQL_BLOCK_RE = re.compile(r"```(?:sql)?(.*?)```", re.DOTALL)
+
+# Row-limiting clauses (LIMIT n / LIMIT ALL / FETCH FIRST ...), plus the quoted
+# text and comments that are masked out before deciding which clause (if any)
+# belongs to the outermost query
+_LIMIT_CLAUSE_RE = re.compile(
+    r"\bLIMIT\s+(?:\d+|ALL)\b|\bFETCH\s+(?:FIRST|NEXT)\s+(?:\d+\s+)?ROWS?\s+(?:ONLY|WITH\s+TIES)\b",
+    re.IGNORECASE,
+)
+_SQL_QUOTED_OR_COMMENT_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", re.DOTALL)
+# What may follow the outer limit for it to be the query's final clause
+# (an OFFSET and/or a row-locking clause)
+_LIMIT_TAIL_RE = re.compile(
+    r"(?:\s+OFFSET\s+\d+(?:\s+ROWS?)?)?(?:\s+FOR\s+(?:NO\s+KEY\s+|KEY\s+)?(?:UPDATE|SHARE)\b[^;]*)?\s*;?\s*\Z",
+    re.IGNORECASE,
+)
+
+def _mask_quoted(sql: str) -> str:
+    """Blank out quoted text and comments, keeping every offset intact."""
+    return _SQL_QUOTED_OR_COMMENT_RE.sub(lambda m: " " * len(m.group()), sql)
+
+def _sub_outside_quotes(pattern: re.Pattern, replacement: str, sql: str) -> str:
+    """``pattern.sub`` over the SQL code only, leaving quoted text and comments alone."""
+    parts = []
+    pos = 0
+    for quoted in _SQL_QUOTED_OR_COMMENT_RE.finditer(sql):
+        parts.append(pattern.sub(lambda _: replacement, sql[pos:quoted.start()]))
+        parts.append(quoted.group())
+        pos = quoted.end()
+    parts.append(pattern.sub(lambda _: replacement, sql[pos:]))
+    return "".join(parts)
+
+def _set_limit(sql: str, limit: str) -> str | None:
+    """Set the outer query's row limit.
+
+    A LIMIT/FETCH clause at parenthesis depth 0 that ends the query is replaced
+    in place; if there is none (or only inside subqueries/CTEs) a LIMIT is
+    appended on a new line, so a trailing ``-- comment`` cannot swallow it.
+    Returns None when an outer clause exists but is not the final one.
+    """
+    masked = _mask_quoted(sql)
+    outer = [
+        m for m in _LIMIT_CLAUSE_RE.finditer(masked)
+        if masked.count("(", 0, m.start()) == masked.count(")", 0, m.start())
+    ]
+    if not outer:
+        return f"{strip_statement_end(sql)}\nLIMIT {limit}"
+    last = outer[-1]
+    if not _LIMIT_TAIL_RE.match(masked, last.end()):
+        return None
+    clause = last.group().upper()
+    if clause.startswith("FETCH"):
+        replacement = f"FETCH FIRST {limit} ROWS " + ("WITH TIES" if clause.endswith("TIES") else "ONLY")
+    else:
+        replacement = f"LIMIT {limit}"
+    return f"{sql[:last.start()]}{replacement}{sql[last.end():]}"
+
+# Trivial corrections applied to the proposed SQL locally, without an LLM round trip
+_QUICK_FIX_PATTERNS = [
+    # s/old/new/ : literal substitution
+    (re.compile(r"^s/(.+?)/(.*)/$"), lambda m, sql: sql.replace(m.group(1), m.group(2))),
+    # change old to new : whole-word substitution outside quoted text and comments
+    (re.compile(r"^change\s+(\w+)\s+to\s+(\w+)$", re.IGNORECASE),
+     lambda m, sql: _sub_outside_quotes(re.compile(rf"\b{re.escape(m.group(1))}\b"), m.group(2), sql)),
+    # limit N : set the outer LIMIT
+    (re.compile(r"^limit\s+(\d+)$", re.IGNORECASE), lambda m, sql: _set_limit(sql, m.group(1))),
+]
+
+def _apply_quick_fix(feedback: str, content: str) -> str | None:
+    """Apply a quick-fix feedback pattern to the SQL block in ``content``.
+
+    Returns the corrected query, or None if the feedback is not a quick fix,
+    the message has no SQL block, or the fix can't be applied safely or
+    leaves the query unchanged.
+    """
+    match = _SQL_BLOCK_RE.search(content) if "```" in content else None
+    if not match:
+        return None
+    query = match.group(1).strip()
+    for pattern, fix in _QUICK_FIX_PATTERNS:
+        m = pattern.match(feedback)
+        if m:
+            fixed = fix(m, query)
+            return fixed if fixed is not None and fixed != query else None
+    return None
+
+# Rows buffered to size the result table's columns before streaming the rest
+_WIDTH_SAMPLE_ROWS = 200
+
+# Console banners, built once instead of on every print
+_HUMAN_HEADER = "=" * 32 + " Human Message " + "=" * 33
+_AI_ACTION_HEADER = "=" * 34 + " AI Action " + "=" * 35
+_AGENT_RESPONSE_HEADER = "=" * 34 + " Agent Response " + "=" * 34
+_APPROVAL_HEADER = "*" * 30 + " Approval Required " + "*" * 30
+_RESULT_HEADER = "=" * 33 + " Execution Result " + "=" * 33
+_RESULT_FOOTER = "=" * 84
+_TURN_SEPARATOR = "=" * 80
+
+# LangGraph's trigger channel for the human_approval node: it is written when
+# the agent routes to approval and stays in the checkpoint until the node runs.
+_APPROVAL_TRIGGER = "branch:to:human_approval"
+
+def _is_awaiting_approval(ckpt_tuple) -> bool:
+    """Cheap equivalent of ``"human_approval" in graph.get_state(config).next``."""
+    return ckpt_tuple is not None and _APPROVAL_TRIGGER in ckpt_tuple.checkpoint["channel_values"]
+
+def _iter_update_messages(event):
+    """Yields the messages written by each node in a ``stream_mode="updates"`` event."""
+    for update in event.values():
+        # Nodes that return nothing (human_approval) and interrupts carry no dict
+        if isinstance(update, dict):
+            yield from update.get("messages", ())
+
 def print_message_verbose(message):
     """Prints a message in a verbose format matching the user request."""
+    # Each message is assembled first and written once, rather than a print per line
     if isinstance(message, HumanMessage):
-        print("\n" + "=" * 32 + " Human Message " + "=" * 33 + "\n")
-        print(message.content)
+        sys.stdout.write(f"\n{_HUMAN_HEADER}\n\n{message.content}\n")
     elif isinstance(message, AIMessage):
+        parts = []
         if message.tool_calls:
-            print("\n" + "=" * 34 + " AI Action " + "=" * 35)
+            parts += ["", _AI_ACTION_HEADER]
             for tool_call in message.tool_calls:
                 # Just show which tool is being used
-                print(f"Using Tool: {tool_call['name']}")
+                parts.append(f"Using Tool: {tool_call['name']}")
                 # Optional: Show args if useful, but maybe kept minimal?
                 # User asked for "which tool it uses". 
                 # Let's keep args concise or hidden if verbose.
                 # query args are important though.
                 if 'query' in tool_call['args']:
-                    print(f"  Query: {tool_call['args']['query']}") 
+                    parts.append(f"  Query: {tool_call['args']['query']}")
                 elif 'skill_name' in tool_call['args']:
-                    print(f"  Skill: {tool_call['args']['skill_name']}")
+                    parts.append(f"  Skill: {tool_call['args']['skill_name']}")
         
         if message.content:
-            print("\n" + "=" * 34 + " Agent Response " + "=" * 34)
-            print(message.content)
+            parts += ["", _AGENT_RESPONSE_HEADER, message.content]
+
+        if parts:
+            sys.stdout.write("\n".join(parts) + "\n")
 
     elif isinstance(message, ToolMessage):
         # Hide massive tool outputs (like schemas)
@@ -39,12 +161,39 @@ def print_message_verbose(message):
         # print(message.content)
         pass  # Skip printing raw tool outputs to keep UI clean
 
-# ... previous imports ...
-import re
-import psycopg2
+async def _ainput(prompt: str = "") -> str:
+    """Await ``input(prompt)`` without blocking the event loop.
+
+    The read runs on a daemon thread rather than ``asyncio.to_thread``: on
+    Ctrl+C ``asyncio.run`` joins its default executor, which would keep the
+    process alive until the pending ``input()`` got a newline.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def deliver(result, exc):
+        if future.done():  # the awaiting task was cancelled
+            return
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+
+    def read():
+        try:
+            result, exc = input(prompt), None
+        except BaseException as e:  # EOFError etc. surface in the awaiting task
+            result, exc = None, e
+        loop.call_soon_threadsafe(deliver, result, exc)
 
-def run_interactive_session():
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
+async def run_interactive_session():
     """Runs an interactive session with the agent."""
+    # Imported here so importing this module (tests, tooling) doesn't load psycopg2/libpq
+    from .database import get_db_connection, is_read_query, DatabasePool
+
     print("Initializing SQL Assistant...")
     settings = get_settings()
     
@@ -68,32 +217,34 @@ def run_interactive_session():
     
     while True:
         try:
-            # Check if we are waiting for approval (interrupted state)
-            snapshot = graph.get_state(config)
-            if snapshot.next and "human_approval" in snapshot.next:
-                print("\n" + "*" * 30 + " Approval Required " + "*" * 30)
+            # Check if we are waiting for approval (interrupted state).
+            # Read the checkpoint directly: graph.get_state() rebuilds the full
+            # snapshot (tasks, next nodes) on every turn.
+            ckpt_tuple = await memory.aget_tuple(config)
+            if _is_awaiting_approval(ckpt_tuple):
+                print("\n" + _APPROVAL_HEADER)
                 print("The agent has generated a response/query.")
                 
                 # Get the last message content
-                last_msg = snapshot.values["messages"][-1]
+                last_msg = ckpt_tuple.checkpoint["channel_values"]["messages"][-1]
                 content = last_msg.content
                 
-                decision = input("Do you approve this response? (y/n): ").strip().lower()
+                decision = (await _ainput("Do you approve this response? (y/n): ")).strip().lower()
                 
                 if decision == "y":
                     print("Approved. Executing locally...")
                     
                     # 1. Extract SQL from content
                     # Look for ```sql ... ``` or just ``` ... ```
-                    match = re.search(r"```(?:sql)?(.*?)```", content, re.DOTALL)
+                    # (plain substring test first: prose answers skip the regex entirely)
+                    match = _SQL_BLOCK_RE.search(content) if "```" in content else None
                     if match:
                         query = match.group(1).strip()
                     else:
                         # Fallback: assume the whole message might be a query if no blocks
                         # Check if it looks like a query before warning
                         candidate = content.strip()
-                        upper_candidate = candidate.upper()
-                        if upper_candidate.startswith("SELECT") or upper_candidate.startswith("WITH"):
+                        if is_read_query(candidate):
                              # Likely a raw query, proceed silently
                              query = candidate
                         else:
@@ -102,52 +253,55 @@ def run_interactive_session():
 
                     # 2. Execute locally (No Agent/LLM call)
                     try:
-                        settings = get_settings()
-                        conn = psycopg2.connect(
-                            host=settings.POSTGRES_HOST,
-                            database=settings.POSTGRES_DB,
-                            user=settings.POSTGRES_USER,
-                            password=settings.POSTGRES_PASSWORD,
-                            port=settings.POSTGRES_PORT
+                        read_query = is_read_query(query)
+                        # Pooled connection: no TCP/auth handshake per approved query.
+                        # Reads run in a read-only transaction (the server-side cursor
+                        # needs one), which is rolled back on return.
+                        with get_db_connection(readonly=read_query) as conn:
+                            if read_query:
+                                # Named (server-side) cursor: rows arrive in chunks and
+                                # are printed as they stream, so memory stays flat
+                                cursor = conn.cursor(name="cli_stream")
+                                cursor.itersize = 1000
+                                cursor.execute(strip_statement_end(query))
+                            else:
+                                cursor = conn.cursor()
+                                cursor.execute(query)
+
+                            # 3. Format Output
+                            # Column widths are fixed from the first rows; the rest stream
+                            # through with the same widths (longer cells just overflow)
+                            has_rows = read_query or cursor.description is not None
+                            sample = list(itertools.islice(cursor, _WIDTH_SAMPLE_ROWS)) if has_rows else []
+
+                            if not sample:
+                                print("\n[Execution Result]: No results found.")
+                            else:
+                                columns = [col.name for col in cursor.description]
+                                str_rows = [list(map(str, row)) for row in sample]
+                                col_widths = [max(map(len, col)) for col in zip(columns, *str_rows)]
+                                row_fmt = " | ".join(f"{{:<{width}}}" for width in col_widths) + "\n"
+
+                                buf = io.StringIO()
+                                buf.write(f"\n{_RESULT_HEADER}\n")
+                                buf.write(row_fmt.format(*columns))
+                                buf.write("-+-".join("-" * width for width in col_widths) + "\n")
+                                buf.writelines(row_fmt.format(*row) for row in str_rows)
+                                sys.stdout.write(buf.getvalue())
+
+                                sys.stdout.writelines(row_fmt.format(*map(str, row)) for row in cursor)
+                                sys.stdout.write(f"\n{_RESULT_FOOTER}\n")
+
+                            if not read_query:
+                                conn.commit()
+
+                        # Record the result as the approval node's output so the
+                        # checkpoint routes straight to END without another graph pass
+                        await graph.aupdate_state(
+                            config,
+                            {"messages": [HumanMessage(content="<SYSTEM: Execution Completed Locally>")]},
+                            as_node="human_approval",
                         )
-                        cursor = conn.cursor()
-                        cursor.execute(query)
-                        
-                        if cursor.description:
-                            columns = [col.name for col in cursor.description]
-                            results = cursor.fetchall()
-                        else:
-                            columns = []
-                            results = []
-                            
-                        conn.commit()
-                        conn.close()
-                        
-                        # 3. Format Output
-                        if not results:
-                            print("\n[Execution Result]: No results found.")
-                        else:
-                            col_widths = [len(col) for col in columns]
-                            formatted_rows = []
-                            for row in results:
-                                str_row = [str(cell) for cell in row]
-                                formatted_rows.append(str_row)
-                                for i, cell_str in enumerate(str_row):
-                                    col_widths[i] = max(col_widths[i], len(cell_str))
-
-                            header = " | ".join(col.ljust(width) for col, width in zip(columns, col_widths))
-                            separator = "-+-".join("-" * width for width in col_widths)
-                            lines = ["", "=" * 33 + " Execution Result " + "=" * 33, header, separator]
-                            for row in formatted_rows:
-                                lines.append(" | ".join(cell.ljust(width) for cell, width in zip(row, col_widths)))
-                            
-                            print("\n".join(lines))
-                            print("\n" + "=" * 84)
-
-                       
-                        graph.update_state(config, {"messages": [HumanMessage(content="<SYSTEM: Execution Completed Locally>")]})
-                        # IMPORTANT: Resume graph execution to process this message and reach END
-                        list(graph.stream(None, config, stream_mode="values"))
                         
                                                 
                     except Exception as e:
@@ -156,41 +310,66 @@ def run_interactive_session():
                     continue
                 else:
                     # ... rejection logic ...
-                    feedback = input("Please provide feedback/correction: ").strip()
+                    feedback = (await _ainput("Please provide feedback/correction: ")).strip()
+
+                    fixed_query = _apply_quick_fix(feedback, content)
+                    if fixed_query is not None:
+                        print("Applying quick fix locally...")
+                        fixed_msg = AIMessage(content=f"```sql\n{fixed_query}\n```")
+                        # Record the feedback, then the corrected query as the agent's
+                        # answer: the graph is back at approval without calling the LLM
+                        await graph.aupdate_state(
+                            config,
+                            {"messages": [HumanMessage(content=f"Rejected. Feedback: {feedback}")]},
+                            as_node="human_approval",
+                        )
+                        await graph.aupdate_state(config, {"messages": [fixed_msg]}, as_node="agent")
+                        print_message_verbose(fixed_msg)
+                        continue
+
                     print("Sending feedback to agent...")
-                    graph.update_state(config, {"messages": [HumanMessage(content=f"Rejected. Feedback: {feedback}")]})
+                    await graph.aupdate_state(config, {"messages": [HumanMessage(content=f"Rejected. Feedback: {feedback}")]})
                     # ... streaming ...
-                    events = graph.stream(None, config, stream_mode="values")
-                    for event in events:
-                         if "messages" in event:
-                             msg = event["messages"][-1]
-                             if isinstance(msg, AIMessage):
-                                 print_message_verbose(msg)
+                    async for event in graph.astream(None, config, stream_mode="updates"):
+                        for msg in _iter_update_messages(event):
+                            if isinstance(msg, AIMessage):
+                                print_message_verbose(msg)
                     continue
 
-            print("\n" + "=" * 80) # Separator for new turn
-            user_input = input("User: ")
+            print("\n" + _TURN_SEPARATOR) # Separator for new turn
+            user_input = await _ainput("User: ")
             if user_input.lower() in ["exit", "quit"]:
                 print("Goodbye!")
                 break
             
             # Send the user message to the graph
-            events = graph.stream({"messages": [HumanMessage(content=user_input)]}, config, stream_mode="values")
-            
-            for event in events:
-                if "messages" in event:
-                    msg = event["messages"][-1]
-                    if isinstance(msg, HumanMessage) and msg.content == user_input:
-                        continue
+            # "updates" yields only what each node wrote, so the user's own
+            # message is never echoed back
+            async for event in graph.astream({"messages": [HumanMessage(content=user_input)]}, config, stream_mode="updates"):
+                for msg in _iter_update_messages(event):
                     print_message_verbose(msg)
             
         except KeyboardInterrupt:
             print("\nGoodbye!")
             break
+        except asyncio.CancelledError:
+            # Ctrl+C under asyncio.run cancels this task: release the pool and
+            # let the cancellation propagate (main() prints the goodbye)
+            DatabasePool.close_all()
+            raise
         except Exception as e:
             print(f"Error: {e}")
             import traceback
             traceback.print_exc()
 
+    DatabasePool.close_all()
+
+def main():
+    """Runs the interactive session, treating Ctrl+C as a normal exit."""
+    try:
+        asyncio.run(run_interactive_session())
+    except KeyboardInterrupt:
+        print("\nGoodbye!")
+
 if __name__ == "__main__":
-    run_interactive_session()
+    main()
@@ -1,6 +1,5 @@
 from typing import TypedDict
 import os
-from pathlib import Path
 
 class Skill(TypedDict):
     """A skill that can be progressively disclosed to the agent."""
@@ -8,54 +7,88 @@ class Skill(TypedDict):
     description: str
     content: str
 
+def _read_content(path) -> str | None:
+    """Read a skill's content file, or return None if it does not exist."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
 class SkillRepository:
     def __init__(self):
         # We'll determine the skills directory based on this file's location
         # src/sql_assistant/skills/repository.py -> parent is 'skills'
-        self.skills_dir = Path(__file__).parent
+        # Kept as a plain str: paths are built with os.path, not Path objects
+        self.skills_dir = os.path.dirname(os.path.abspath(__file__))
+        # In-memory index of skills by name, built on first use so that
+        # constructing the repository (e.g. at import) touches no files.
+        # _skills holds the same skills with their content preloaded.
+        self._index: dict[str, Skill] | None = None
+        self._skills: dict[str, Skill] = {}
+        self._names_csv = ""
+
+    def reload(self) -> None:
+        """Rescan the skills directory (e.g. after editing skills during development)."""
+        index = {skill["name"]: skill for skill in self._scan_skills()}
+        skills = {}
+        for name, skill in index.items():
+            content = _read_content(os.path.join(self.skills_dir, name, "content.md"))
+            if content is not None:
+                skills[name] = {**skill, "content": content}
+        
+        # Publish the index last: readers that see it also see the matching
+        # contents and names, so a concurrent get_skill never misses a skill
+        self._skills = skills
+        self._names_csv = ", ".join(index)
+        self._index = index
+
+    def _ensure_loaded(self) -> dict[str, Skill]:
+        """Return the skill index, scanning the skills directory on first call."""
+        if self._index is None:
+            self.reload()
+        return self._index
 
     def list_skills(self) -> list[Skill]:
-        """Return a list of all available skills by scanning directories."""
+        """Return a list of all available skills from the in-memory index."""
+        return list(self._ensure_loaded().values())
+
+    def _scan_skills(self) -> list[Skill]:
+        """Build the skill listing by scanning directories."""
         skills = []
         
-        # Scan subdirectories in the skills folder
-        if not self.skills_dir.exists():
+        # Scan subdirectories in the skills folder. scandir caches each entry's
+        # type, and opening description.txt directly replaces a separate exists().
+        try:
+            entries = os.scandir(self.skills_dir)
+        except FileNotFoundError:
             return []
 
-        for item in self.skills_dir.iterdir():
-            if item.is_dir() and not item.name.startswith("__"):
-                description_path = item / "description.txt"
-                if description_path.exists():
-                    description = description_path.read_text(encoding="utf-8").strip()
-                    skills.append({
-                        "name": item.name,
-                        "description": description,
-                        "content": ""  # Don't load full content yet
-                    })
+        with entries:
+            for entry in entries:
+                if not entry.is_dir() or entry.name.startswith("__"):
+                    continue
+                try:
+                    with open(os.path.join(entry.path, "description.txt"), encoding="utf-8") as f:
+                        description = f.read().strip()
+                except FileNotFoundError:
+                    continue
+                skills.append({
+                    "name": entry.name,
+                    "description": description,
+                    "content": ""  # Don't load full content yet
+                })
         return skills
 
     def get_skill(self, skill_name: str) -> Skill | None:
-        """Get a full skill by name, loading content from file."""
-        skill_dir = self.skills_dir / skill_name
-        if not skill_dir.exists() or not skill_dir.is_dir():
-            return None
-            
-        description_path = skill_dir / "description.txt"
-        content_path = skill_dir / "content.md"
-        
-        if not description_path.exists() or not content_path.exists():
-            return None
-            
-        return {
-            "name": skill_name,
-            "description": description_path.read_text(encoding="utf-8").strip(),
-            "content": content_path.read_text(encoding="utf-8").strip()
-        }
+        """Get a full skill by name (None if unknown or it has no content.md)."""
+        self._ensure_loaded()
+        return self._skills.get(skill_name)
 
     def get_skill_names(self) -> str:
         """Return comma-separated list of skill names."""
-        skills = self.list_skills()
-        return ", ".join([s["name"] for s in skills])
+        self._ensure_loaded()
+        return self._names_csv
 
 _repository = SkillRepository()
 
@@ -1,6 +1,14 @@
 import pytest
-from src.sql_assistant.config import Settings
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from src.sql_assistant import agent
+from src.sql_assistant.config import Settings, get_settings
 from src.sql_assistant.skills.repository import SkillRepository
+from src.sql_assistant.main import _apply_quick_fix, _is_awaiting_approval
+from src.sql_assistant.agent import _preview_query, strip_statement_end
+from src.sql_assistant.database import is_read_query
 
 def test_settings_loading():
     settings = Settings(OPENAI_API_KEY="test-key", OPENAI_MODEL_NAME="gpt-5-mini-test")
@@ -30,3 +38,146 @@ def test_skill_repository_file_based():
     # Verify missing skill
     missing = repo.get_skill("non_existent")
     assert missing is None
+
+def test_skill_repository_index_reload(tmp_path):
+    repo = SkillRepository()
+    repo.skills_dir = tmp_path
+    
+    (tmp_path / "alpha").mkdir()
+    (tmp_path / "alpha" / "description.txt").write_text("Alpha skill", encoding="utf-8")
+    (tmp_path / "alpha" / "content.md").write_text("Alpha schema", encoding="utf-8")
+    # Nothing is scanned at construction; the first lookup builds the index
+    assert [s["name"] for s in repo.list_skills()] == ["alpha"]
+    assert repo.get_skill("alpha")["content"] == "Alpha schema"
+    
+    # New skills are not picked up until the index is reloaded
+    (tmp_path / "beta").mkdir()
+    (tmp_path / "beta" / "description.txt").write_text("Beta skill", encoding="utf-8")
+    assert [s["name"] for s in repo.list_skills()] == ["alpha"]
+    
+    repo.reload()
+    assert sorted(s["name"] for s in repo.list_skills()) == ["alpha", "beta"]
+    assert sorted(repo.get_skill_names().split(", ")) == ["alpha", "beta"]
+    # Listed, but without content.md it cannot be loaded
+    assert repo.get_skill("beta") is None
+
+def test_apply_quick_fix():
+    content = "Here you go:\n```sql\nSELECT id, name FROM customers LIMIT 3;\n```"
+    
+    assert _apply_quick_fix("limit 5", content) == "SELECT id, name FROM customers LIMIT 5;"
+    assert _apply_quick_fix("s/id, //", content) == "SELECT name FROM customers LIMIT 3;"
+    assert _apply_quick_fix("change name to email", content) == "SELECT id, email FROM customers LIMIT 3;"
+    # No LIMIT yet: one is appended on its own line
+    assert _apply_quick_fix("LIMIT 10", "```sql\nSELECT 1;\n```") == "SELECT 1\nLIMIT 10"
+    # A LIMIT inside a CTE is left alone; the outer query gets its own
+    cte = "```sql\nWITH t AS (SELECT * FROM orders LIMIT 10) SELECT * FROM t ORDER BY x\n```"
+    assert _apply_quick_fix("limit 5", cte) == (
+        "WITH t AS (SELECT * FROM orders LIMIT 10) SELECT * FROM t ORDER BY x\nLIMIT 5"
+    )
+    # A trailing comment can't swallow the appended LIMIT
+    assert _apply_quick_fix("limit 5", "```sql\nSELECT * FROM t -- newest first\n```") == (
+        "SELECT * FROM t -- newest first\nLIMIT 5"
+    )
+    # The outer LIMIT is replaced even with OFFSET, parentheses in strings and comments
+    outer = "```sql\nSELECT '(' AS p FROM t /* ( */ LIMIT 3 OFFSET 6;\n```"
+    assert _apply_quick_fix("limit 5", outer) == "SELECT '(' AS p FROM t /* ( */ LIMIT 5 OFFSET 6;"
+    assert _apply_quick_fix("limit 5", "```sql\nSELECT * FROM t LIMIT 3 FOR UPDATE\n```") == "SELECT * FROM t LIMIT 5 FOR UPDATE"
+    # LIMIT ALL and FETCH FIRST are the outer limit too; no second LIMIT is added
+    assert _apply_quick_fix("limit 5", "```sql\nSELECT * FROM t LIMIT ALL\n```") == "SELECT * FROM t LIMIT 5"
+    assert _apply_quick_fix("limit 5", "```sql\nSELECT * FROM t OFFSET 2 ROWS FETCH FIRST 3 ROWS ONLY;\n```") == (
+        "SELECT * FROM t OFFSET 2 ROWS FETCH FIRST 5 ROWS ONLY;"
+    )
+    
+    # Renames leave string literals, quoted identifiers and comments alone
+    quoted = "```sql\nSELECT status, \"status\" FROM t WHERE status = 'status' -- by status\n```"
+    assert _apply_quick_fix("change status to state", quoted) == (
+        "SELECT state, \"status\" FROM t WHERE state = 'status' -- by status"
+    )
+    
+    # Anything else goes back to the agent
+    assert _apply_quick_fix("only active customers", content) is None
+    assert _apply_quick_fix("limit 3", content) is None  # no change
+    assert _apply_quick_fix("limit 5", "No SQL here") is None
+
+def test_preview_query_building():
+    # Trailing terminators are dropped, including when a comment follows them
+    assert strip_statement_end("SELECT 1;") == "SELECT 1"
+    assert strip_statement_end("  SELECT 1; -- note\n") == "SELECT 1"
+    assert strip_statement_end("SELECT 1 /* a */ ;\n/* b */") == "SELECT 1 /* a */ "
+    assert strip_statement_end("SELECT ';'") == "SELECT ';'"
+    # A comment before another statement is not part of the trailing comments
+    assert strip_statement_end("SELECT 1; /* x */ SELECT 2 /* y */") == "SELECT 1; /* x */ SELECT 2 /* y */"
+    
+    # The wrapper starts on a new line, so a trailing comment can't swallow it
+    wrapped = _preview_query("SELECT 1 -- note", 11)
+    assert wrapped == "SELECT * FROM (\nSELECT 1 -- note\n) AS _preview LIMIT 11"
+
+def test_is_read_query():
+    assert is_read_query("SELECT * FROM customers")
+    assert is_read_query("  with t AS (SELECT 1) SELECT * FROM t")
+    assert is_read_query("SELECT updated_at FROM orders")
+    
+    # Writes that start like reads must take the read-write path
+    assert not is_read_query("WITH d AS (DELETE FROM t RETURNING *) INSERT INTO t2 SELECT * FROM d")
+    assert not is_read_query("SELECT * INTO backup FROM customers")
+    assert not is_read_query("SELECT setval('orders_order_id_seq', 1)")
+    assert not is_read_query("SELECT * FROM orders FOR UPDATE")
+    assert not is_read_query("UPDATE customers SET name = 'x'")
+
+class _FakeChatModel(GenericFakeChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+def _fake_responses():
+    # Every agent turn: load a skill, then propose a query
+    while True:
+        yield AIMessage(content="", tool_calls=[{"name": "load_skill", "args": {"skill_name": "sales_analytics"}, "id": "call_1"}])
+        yield AIMessage(content="```sql\nSELECT 1 LIMIT 3\n```")
+
+def test_cli_approval_check_matches_graph_state(monkeypatch):
+    # The CLI reads LangGraph's trigger channel directly instead of get_state();
+    # this pins that shortcut to get_state().next through the CLI's flows
+    for key in ("OPENAI_API_KEY", "POSTGRES_USER", "POSTGRES_PASSWORD", "POSTGRES_DB", "POSTGRES_HOST", "POSTGRES_PORT"):
+        monkeypatch.setenv(key, "test")
+    get_settings.cache_clear()
+    monkeypatch.setattr(agent, "ChatOpenAI", lambda **kwargs: _FakeChatModel(messages=_fake_responses()))
+    
+    memory = InMemorySaver()
+    graph = agent.create_agent_graph(checkpointer=memory)
+    config = {"configurable": {"thread_id": "approval-check"}}
+    
+    def check(expected):
+        awaiting = _is_awaiting_approval(memory.get_tuple(config))
+        assert awaiting == ("human_approval" in graph.get_state(config).next)
+        assert awaiting is expected
+    
+    try:
+        check(False)
+        
+        # The agent proposes a query and pauses for approval
+        for _ in graph.stream({"messages": [HumanMessage(content="top customers")]}, config):
+            pass
+        check(True)
+        
+        # Rejection feedback goes back through the agent to approval
+        graph.update_state(config, {"messages": [HumanMessage(content="Rejected. Feedback: more columns")]})
+        for _ in graph.stream(None, config):
+            pass
+        check(True)
+        
+        # Quick fix: feedback recorded as the approval step, fixed query as the agent's
+        graph.update_state(config, {"messages": [HumanMessage(content="Rejected. Feedback: limit 5")]}, as_node="human_approval")
+        check(False)
+        graph.update_state(config, {"messages": [AIMessage(content="```sql\nSELECT 1 LIMIT 5\n```")]}, as_node="agent")
+        check(True)
+        
+        # Local execution recorded as the approval step ends the turn
+        graph.update_state(config, {"messages": [HumanMessage(content="<SYSTEM: Execution Completed Locally>")]}, as_node="human_approval")
+        check(False)
+        
+        # A new turn pauses for approval again
+        for _ in graph.stream({"messages": [HumanMessage(content="again")]}, config):
+            pass
+        check(True)
+    finally:
+        get_settings.cache_clear()